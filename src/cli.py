@@ -1,26 +1,46 @@
 #!/usr/bin/env python3
+import dataclasses
 import os
+import queue
+import threading
 import click
-import glob
+from typing import List, Optional
 from .utils import setup_logger, Config
 from .phases import InputPhase, SplitPhase, ScriptPhase, SynthesizePhase
 
 logger = setup_logger()
 
+def _list_sorted(indir: str, prefix: str, suffix: str = '.txt') -> List[str]:
+    """List files in indir matching prefix*suffix, sorted by path"""
+    if not os.path.isdir(indir):
+        return []
+    
+    # scandir の DirEntry は種別情報を持つため、glob のような追加の stat が不要
+    with os.scandir(indir) as entries:
+        return sorted(
+            entry.path for entry in entries
+            if entry.name.startswith(prefix) and entry.name.endswith(suffix) and entry.is_file()
+        )
+
+def _with_tts_concurrency(config: Config, concurrency: Optional[int]) -> Config:
+    """Return config with tts_concurrency overridden by the --concurrency option, if given"""
+    if concurrency is None:
+        return config
+    return dataclasses.replace(config, tts_concurrency=concurrency)
+
 @click.group()
 @click.option('--env-file', type=click.Path(exists=True), help='Path to .env file')
 @click.pass_context
 def cli(ctx, env_file):
     """PDF/Text to Podcast Audio Generator"""
     ctx.ensure_object(dict)
-    ctx.obj['config'] = Config.from_env(env_file)
     
     try:
-        ctx.obj['config'].validate()
+        ctx.obj['config'] = Config.from_env(env_file)
     except ValueError as e:
         logger.error(f"Configuration error: {e}")
         click.echo(f"Error: {e}")
-        click.echo("Please set GENAI_API_KEY in your .env file")
+        click.echo("Please check the settings in your .env file (see .env.template)")
         ctx.exit(1)
 
 @cli.command()
@@ -29,8 +49,9 @@ def cli(ctx, env_file):
 @click.option('--start', type=int, help='Start page for PDF')
 @click.option('--end', type=int, help='End page for PDF')
 @click.option('--output-dir', default='output', help='Output directory')
+@click.option('--workers', type=click.IntRange(min=1), help='Worker processes for PDF extraction (default: CPU count)')
 @click.pass_context
-def input(ctx, pdf, text, start, end, output_dir):
+def input(ctx, pdf, text, start, end, output_dir, workers):
     """Phase 1: Extract text from PDF or text file"""
     if not pdf and not text:
         click.echo("Error: Please provide either --pdf or --text file")
@@ -40,7 +61,7 @@ def input(ctx, pdf, text, start, end, output_dir):
         click.echo("Error: Please provide either --pdf or --text, not both")
         return
     
-    phase = InputPhase(output_dir)
+    phase = InputPhase(output_dir, workers)
     
     try:
         if pdf:
@@ -84,7 +105,7 @@ def script(ctx, indir, style, output_dir):
     config = ctx.obj['config']
     phase = ScriptPhase(config, output_dir)
     
-    chunk_files = sorted(glob.glob(os.path.join(indir, 'chunk_*.txt')))
+    chunk_files = _list_sorted(indir, 'chunk_')
     if not chunk_files:
         click.echo(f"Error: No chunk files found in {indir}")
         return
@@ -104,13 +125,14 @@ def script(ctx, indir, style, output_dir):
 @click.option('--voice', help='Voice name (overrides .env)')
 @click.option('--voice-style', help='Voice style (overrides .env)')
 @click.option('--output-dir', default='output/audio', help='Output directory')
+@click.option('--concurrency', type=click.IntRange(min=1), help='Concurrent TTS requests (overrides .env)')
 @click.pass_context
-def synthesize(ctx, indir, voice, voice_style, output_dir):
+def synthesize(ctx, indir, voice, voice_style, output_dir, concurrency):
     """Phase 4: Synthesize audio from scripts"""
-    config = ctx.obj['config']
+    config = _with_tts_concurrency(ctx.obj['config'], concurrency)
     phase = SynthesizePhase(config, output_dir)
     
-    script_files = sorted(glob.glob(os.path.join(indir, 'script_*.txt')))
+    script_files = _list_sorted(indir, 'script_')
     if not script_files:
         click.echo(f"Error: No script files found in {indir}")
         return
@@ -134,14 +156,15 @@ def synthesize(ctx, indir, voice, voice_style, output_dir):
 @click.option('--voice-style', help='Voice style')
 @click.option('--target-minutes', default=5, help='Target minutes per chunk')
 @click.option('--script-style', default='親しみやすく', help='Script style')
+@click.option('--concurrency', type=click.IntRange(min=1), help='Concurrent TTS requests (overrides .env)')
 @click.pass_context
-def all(ctx, pdf, text, start, end, voice, voice_style, target_minutes, script_style):
-    """Run all phases sequentially"""
+def all(ctx, pdf, text, start, end, voice, voice_style, target_minutes, script_style, concurrency):
+    """Run all phases (script generation and synthesis overlap)"""
     if not pdf and not text:
         click.echo("Error: Please provide either --pdf or --text file")
         return
     
-    config = ctx.obj['config']
+    config = _with_tts_concurrency(ctx.obj['config'], concurrency)
     
     click.echo("=== Phase 1: Input Processing ===")
     input_phase = InputPhase()
@@ -164,28 +187,44 @@ def all(ctx, pdf, text, start, end, voice, voice_style, target_minutes, script_s
         click.echo(f"✗ Split phase failed: {e}")
         return
     
-    click.echo("\n=== Phase 3: Script Generation ===")
+    click.echo("\n=== Phase 3/4: Script Generation & Audio Synthesis ===")
     script_phase = ScriptPhase(config)
-    try:
-        script_files = script_phase.process(chunk_files, script_style)
-        click.echo(f"✓ Generated {len(script_files)} scripts")
-    except Exception as e:
-        click.echo(f"✗ Script phase failed: {e}")
-        return
-    
-    click.echo("\n=== Phase 4: Audio Synthesis ===")
     synthesize_phase = SynthesizePhase(config)
+    
+    # 台本は書き出された順にキューへ流し、音声合成は台本生成の完了を待たずに始める
+    script_queue: queue.Queue = queue.Queue()
+    script_result = {}
+    
+    def produce_scripts():
+        try:
+            script_result['files'] = script_phase.process(
+                chunk_files, script_style, on_script=script_queue.put
+            )
+        except Exception as e:
+            script_result['error'] = e
+        finally:
+            script_queue.put(None)
+    
+    producer = threading.Thread(target=produce_scripts, daemon=True)
+    producer.start()
     try:
-        audio_files = synthesize_phase.process(script_files, voice, voice_style)
-        click.echo(f"✓ Generated {len(audio_files)} audio files")
-        
-        click.echo("\n=== Complete ===")
-        click.echo("Audio files generated:")
-        for audio in audio_files:
-            click.echo(f"  - {audio}")
+        audio_files = synthesize_phase.process(iter(script_queue.get, None), voice, voice_style)
     except Exception as e:
         click.echo(f"✗ Synthesize phase failed: {e}")
         return
+    finally:
+        producer.join()
+    
+    if 'error' in script_result:
+        click.echo(f"✗ Script phase failed: {script_result['error']}")
+        return
+    click.echo(f"✓ Generated {len(script_result['files'])} scripts")
+    click.echo(f"✓ Generated {len(audio_files)} audio files")
+    
+    click.echo("\n=== Complete ===")
+    click.echo("Audio files generated:")
+    for audio in audio_files:
+        click.echo(f"  - {audio}")
 
 if __name__ == '__main__':
     cli()
\ No newline at end of file
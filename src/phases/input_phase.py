@@ -1,14 +1,36 @@
+import io
+import logging
 import os
-from typing import Optional, Tuple
-import PyPDF2
-import pdfplumber
-from ..utils import setup_logger
+from multiprocessing import Pool
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple
+import pymupdf as fitz
+from ..utils import WRITE_BUFFER_SIZE, setup_logger
+
+if TYPE_CHECKING:
+    import PyPDF2
 
 logger = setup_logger(__name__)
 
+# pdfminer はログレベルが低いとページごとに大量のログを出し、抽出が大幅に遅くなる
+for _name in ("pdfminer", "pdfminer.pdfinterp", "pdfminer.pdfpage", "pdfplumber"):
+    logging.getLogger(_name).setLevel(logging.WARNING)
+
+# 1タスクあたりの最大ページ数。結果を小分けに受け取り、逐次ファイルに書き出す
+_PAGES_PER_TASK = 32
+
+def _extract_page_range(args: Tuple[str, int, int]) -> List[str]:
+    """Worker for the process pool: extract pages [start_idx, end_idx) with its own document handle"""
+    pdf_path, start_idx, end_idx = args
+    doc = fitz.open(pdf_path)
+    try:
+        return [doc.load_page(i).get_text("text") for i in range(start_idx, end_idx)]
+    finally:
+        doc.close()
+
 class InputPhase:
-    def __init__(self, output_dir: str = "output"):
+    def __init__(self, output_dir: str = "output", workers: Optional[int] = None):
         self.output_dir = output_dir
+        self.workers = workers or os.cpu_count() or 1
         os.makedirs(output_dir, exist_ok=True)
     
     def process_pdf(self, pdf_path: str, start_page: Optional[int] = None, 
@@ -18,10 +40,8 @@ class InputPhase:
         
         logger.info(f"Processing PDF: {pdf_path}")
         
-        text_content = self._extract_pdf_text(pdf_path, start_page, end_page)
-        
         output_path = os.path.join(self.output_dir, "input_text.txt")
-        self._save_text(text_content, output_path)
+        self._extract_pdf_text(pdf_path, start_page, end_page, output_path)
         
         logger.info(f"Extracted text saved to: {output_path}")
         return output_path
@@ -44,79 +64,144 @@ class InputPhase:
         return output_path
     
     def _extract_pdf_text(self, pdf_path: str, start_page: Optional[int], 
-                         end_page: Optional[int]) -> str:
+                         end_page: Optional[int], output_path: str):
+        # PDFは1回だけ読み込み、フォールバック時も同じバイト列を使い回す
+        with open(pdf_path, 'rb') as f:
+            data = f.read()
+        
+        try:
+            text_parts = self._extract_with_pymupdf(data, pdf_path, start_page, end_page)
+        except fitz.FileDataError as e:
+            logger.warning(f"PyMuPDF failed: {e}, trying pdfplumber")
+            text_parts = self._extract_with_pdfplumber(data, start_page, end_page)
+        
+        # ページ単位でクリーニングしてそのまま書き出し、全文をメモリに保持しない
+        char_count = 0
+        with open(output_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as out:
+            for text in text_parts:
+                cleaned = self._clean_text(text)
+                if not cleaned:
+                    continue
+                if char_count:
+                    out.write('\n\n')
+                    char_count += 2
+                out.write(cleaned)
+                char_count += len(cleaned)
+        
+        logger.info(f"Saved {char_count} characters to {output_path}")
+    
+    def _page_range(self, total_pages: int, start_page: Optional[int], 
+                    end_page: Optional[int]) -> Tuple[int, int]:
+        start_idx = (start_page - 1) if start_page else 0
+        end_idx = end_page if end_page else total_pages
+        
+        start_idx = max(0, min(start_idx, total_pages - 1))
+        end_idx = max(start_idx + 1, min(end_idx, total_pages))
+        
+        return start_idx, end_idx
+    
+    def _extract_with_pymupdf(self, data: bytes, pdf_path: str, start_page: Optional[int], 
+                              end_page: Optional[int]) -> Iterator[str]:
+        doc = fitz.open(stream=data, filetype="pdf")
+        try:
+            total_pages = doc.page_count
+            start_idx, end_idx = self._page_range(total_pages, start_page, end_page)
+            logger.info(f"Extracting pages {start_idx + 1} to {end_idx} of {total_pages}")
+            
+            page_count = end_idx - start_idx
+            workers = max(1, min(self.workers, page_count))
+            # 1タスク分以下のページ数ではプロセス起動と PDF の再オープンの方が高くつく
+            if workers == 1 or page_count <= _PAGES_PER_TASK:
+                return self._iter_doc_pages(doc, start_idx, end_idx)
+        except Exception:
+            doc.close()
+            raise
+        
+        doc.close()
+        
+        # ページ範囲を連続した小さな範囲に分け、各プロセスに割り当てる
+        # (ワーカーは各自でファイルを開くため、バイト列は渡さない)
+        step = max(1, min(-(-page_count // workers), _PAGES_PER_TASK))
+        args = [(pdf_path, i, min(i + step, end_idx)) for i in range(start_idx, end_idx, step)]
+        
+        return (text for pages in self._iter_page_groups(args, workers) for text in pages if text)
+    
+    def _iter_doc_pages(self, doc: "fitz.Document", start_idx: int, end_idx: int) -> Iterator[str]:
+        try:
+            for i in range(start_idx, end_idx):
+                text = doc.load_page(i).get_text("text")
+                if text:
+                    yield text
+                logger.debug(f"Extracted page {i + 1}")
+        finally:
+            doc.close()
+    
+    def _iter_page_groups(self, args: List[Tuple[str, int, int]], workers: int) -> Iterable[List[str]]:
+        logger.debug(f"Extracting with {workers} worker processes")
+        with Pool(workers) as pool:
+            # imap はページ順を保ったまま完了した範囲から順に返す
+            yield from pool.imap(_extract_page_range, args)
+    
+    def _extract_with_pdfplumber(self, data: bytes, start_page: Optional[int], 
+                                 end_page: Optional[int]) -> Iterable[str]:
         text_parts = []
         
         try:
-            with pdfplumber.open(pdf_path) as pdf:
+            # フォールバック時にしか使わないため、必要になった時点で import する
+            import pdfplumber
+            
+            with pdfplumber.open(io.BytesIO(data)) as pdf:
                 total_pages = len(pdf.pages)
-                
-                start_idx = (start_page - 1) if start_page else 0
-                end_idx = end_page if end_page else total_pages
-                
-                start_idx = max(0, min(start_idx, total_pages - 1))
-                end_idx = max(start_idx + 1, min(end_idx, total_pages))
+                start_idx, end_idx = self._page_range(total_pages, start_page, end_page)
                 
                 logger.info(f"Extracting pages {start_idx + 1} to {end_idx} of {total_pages}")
                 
                 for i in range(start_idx, end_idx):
                     page = pdf.pages[i]
                     text = page.extract_text()
+                    # ページごとのキャッシュ（レイアウト解析結果・テキストマップ）を解放する
+                    page.close()
                     if text:
                         text_parts.append(text)
                     logger.debug(f"Extracted page {i + 1}")
         
         except Exception as e:
             logger.warning(f"pdfplumber failed: {e}, trying PyPDF2")
-            text_parts = self._extract_with_pypdf2(pdf_path, start_page, end_page)
+            text_parts = self._extract_with_pypdf2(data, start_page, end_page)
         
-        full_text = "\n\n".join(text_parts)
-        return self._clean_text(full_text)
+        return text_parts
     
-    def _extract_with_pypdf2(self, pdf_path: str, start_page: Optional[int], 
-                            end_page: Optional[int]) -> list:
-        text_parts = []
+    def _extract_with_pypdf2(self, data: bytes, start_page: Optional[int], 
+                            end_page: Optional[int]) -> Iterator[str]:
+        import PyPDF2
         
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            total_pages = len(pdf_reader.pages)
-            
-            start_idx = (start_page - 1) if start_page else 0
-            end_idx = end_page if end_page else total_pages
-            
-            start_idx = max(0, min(start_idx, total_pages - 1))
-            end_idx = max(start_idx + 1, min(end_idx, total_pages))
-            
-            for i in range(start_idx, end_idx):
-                page = pdf_reader.pages[i]
-                text = page.extract_text()
-                if text:
-                    text_parts.append(text)
+        # リーダーの生成（PDFの解析エラー）は呼び出し時に発生させ、ページは逐次抽出する
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+        total_pages = len(pdf_reader.pages)
+        start_idx, end_idx = self._page_range(total_pages, start_page, end_page)
         
-        return text_parts
+        return self._iter_pypdf2_pages(pdf_reader, start_idx, end_idx)
+    
+    def _iter_pypdf2_pages(self, pdf_reader: "PyPDF2.PdfReader", start_idx: int, 
+                           end_idx: int) -> Iterator[str]:
+        for i in range(start_idx, end_idx):
+            text = pdf_reader.pages[i].extract_text()
+            if text:
+                yield text
     
     def _clean_text(self, text: str) -> str:
-        text = text.replace('\r\n', '\n')
-        text = text.replace('\r', '\n')
-        
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if line:
-                cleaned_lines.append(line)
-        
+        # 1パスで行を走査し、空行を段落の区切りとして段落内の行をスペースで連結する
+        # splitlines() は \r\n / \r / \n のいずれの改行にも対応する
         paragraphs = []
         current_paragraph = []
         
-        for line in cleaned_lines:
-            if not line:
-                if current_paragraph:
-                    paragraphs.append(' '.join(current_paragraph))
-                    current_paragraph = []
-            else:
+        for line in text.splitlines():
+            line = line.strip()
+            if line:
                 current_paragraph.append(line)
+            elif current_paragraph:
+                paragraphs.append(' '.join(current_paragraph))
+                current_paragraph.clear()
         
         if current_paragraph:
             paragraphs.append(' '.join(current_paragraph))
@@ -124,6 +209,6 @@ class InputPhase:
         return '\n\n'.join(paragraphs)
     
     def _save_text(self, text: str, output_path: str):
-        with open(output_path, 'w', encoding='utf-8') as f:
+        with open(output_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
             f.write(text)
         logger.info(f"Saved {len(text)} characters to {output_path}")
\ No newline at end of file
@@ -1,90 +1,161 @@
+import asyncio
 import os
-from typing import List
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 
-import google.generativeai as genai
+from tenacity import retry, retry_if_exception, stop_after_attempt
 
-from ..utils import Config, setup_logger
+from ..utils import (
+    IO_WORKERS, WRITE_BUFFER_SIZE, Config, LLMCache, get_generative_model, is_retryable_error,
+    setup_logger, wait_retry_after
+)
 
 logger = setup_logger(__name__)
 
+_DUPLICATE_PUNCT_RE = re.compile(r'([。、])\1+')
+# 「。」または改行までを1文とみなす
+_SENTENCE_RE = re.compile(r'[^。\n]+。?')
+
+# Gemini のプロンプトキャッシュが効くよう、全チャンクで同一の指示文を先頭に置く
+SCRIPT_PROMPT_PREFIX = """以下のテキストを、ポッドキャストで一人が話すための台本に書き直してください。
+
+要件:
+1. 簡潔に：元のテキストを要約し、重要なポイントを話す
+2. 元の内容に忠実に：創作や装飾的な要素を追加しない
+3. 最大5分程度の長さに収める
+4. トーンは末尾の「スタイル」で指定されたものに
+5. 導入と締めは最小限に（1-2文程度）
+6. 冗長な繋ぎ言葉（「さて」「えーと」など）は控えめに
+
+注意:
+- ポッドキャスト名などを創作しない
+- 過度な挨拶や感嘆詞を避ける
+- 元のテキストの構成を尊重する
+- 台本の内容のみを直接出力し、前置きや説明、「台本開始」「台本終了」などのマーカーは一切含めないでください
+"""
+
 class ScriptPhase:
     def __init__(self, config: Config, output_dir: str = "output/scripts"):
         self.config = config
         self.output_dir = output_dir
-        os.makedirs(output_dir, exist_ok=True)
+        self.cache = LLMCache(os.path.join(output_dir, ".cache"))
         
-        genai.configure(api_key=config.genai_api_key)
-        self.model = genai.GenerativeModel(config.model_script)
+        self.model = get_generative_model(config.genai_api_key, config.model_script)
     
-    def process(self, chunk_files: List[str], style: str = "親しみやすく") -> List[str]:
+    def process(self, chunk_files: List[str], style: str = "親しみやすく",
+                on_script: Optional[Callable[[str], None]] = None) -> List[str]:
+        """チャンクから台本を生成する。on_script には書き込み済みの台本パスが番号順に渡される"""
         logger.info(f"Processing {len(chunk_files)} chunks for script generation")
         
-        output_paths = []
-        
+        indexed_files = []
         for i, chunk_file in enumerate(chunk_files, 1):
             if not os.path.exists(chunk_file):
                 logger.warning(f"Chunk file not found: {chunk_file}")
                 continue
-            
-            with open(chunk_file, 'r', encoding='utf-8') as f:
-                text = f.read()
-            
-            script = self._generate_script(text, style)
-            
-            output_path = os.path.join(self.output_dir, f"script_{i}.txt")
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(script)
-            
-            output_paths.append(output_path)
+            indexed_files.append((i, chunk_file))
+        
+        # 全チャンクを先に読み込み、台本生成は1回の呼び出しでまとめて発行する
+        with ThreadPoolExecutor(max_workers=IO_WORKERS) as executor:
+            texts = list(executor.map(self._read_text, [path for _, path in indexed_files]))
+        
+        output_paths = [
+            os.path.join(self.output_dir, f"script_{i}.txt") for i, _ in indexed_files
+        ]
+        scripts = asyncio.run(self._generate_scripts(texts, output_paths, style, on_script))
+        
+        for (i, _), script in zip(indexed_files, scripts):
             logger.info(f"Generated script {i}: {len(script)} characters")
         
         return output_paths
     
-    def _generate_script(self, text: str, style: str) -> str:
-        prompt = f"""以下のテキストを、ポッドキャストで一人が話すための台本に書き直してください。
-
-要件:
-1. 簡潔に：元のテキストを要約し、重要なポイントを話す
-2. 元の内容に忠実に：創作や装飾的な要素を追加しない
-3. 最大5分程度の長さに収める
-4. トーンは「{style}」に
-5. 導入と締めは最小限に（1-2文程度）
-6. 冗長な繋ぎ言葉（「さて」「えーと」など）は控えめに
-
-注意:
-- ポッドキャスト名などを創作しない
-- 過度な挨拶や感嘆詞を避ける
-- 元のテキストの構成を尊重する
-- 台本の内容のみを直接出力し、前置きや説明、「台本開始」「台本終了」などのマーカーは一切含めないでください
+    async def _generate_scripts(self, texts: List[str], output_paths: List[str], style: str,
+                                on_script: Optional[Callable[[str], None]] = None) -> List[str]:
+        # Gemini のクォータを超えないよう同時リクエスト数を制限する
+        semaphore = asyncio.Semaphore(self.config.script_concurrency)
+        
+        # 生成が終わった台本はすぐ書き出し、先頭から連続して揃った分を on_script に渡す
+        written = [False] * len(texts)
+        next_index = 0
+        
+        async def run_one(idx: int) -> str:
+            nonlocal next_index
+            async with semaphore:
+                script = await self._generate_script(texts[idx], style)
+            await asyncio.to_thread(self._write_text, output_paths[idx], script)
+            
+            written[idx] = True
+            while next_index < len(written) and written[next_index]:
+                if on_script:
+                    on_script(output_paths[next_index])
+                next_index += 1
+            return script
+        
+        # gather は入力と同じ順序で結果を返す
+        return await asyncio.gather(*[run_one(idx) for idx in range(len(texts))])
+    
+    async def _generate_script(self, text: str, style: str) -> str:
+        contents = [SCRIPT_PROMPT_PREFIX, f"""
+スタイル: {style}
 
 テキスト:
 {text}
 
-以下の形式で台本の内容のみを直接出力してください："""
+台本:"""]
+        
+        # 同じモデル・プロンプトの生成結果はキャッシュから返す
+        key = LLMCache.make_key(self.config.model_script, *contents)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Using cached script: {key}")
+            return cached.decode('utf-8')
         
         try:
-            response = self.model.generate_content(prompt)
-            script = response.text.strip()
+            script = await self._call_model(contents)
             
             script = self._post_process_script(script)
             
+            self.cache.put(key, script.encode('utf-8'))
+            
             return script
         
         except Exception as e:
             logger.error(f"Error generating script: {e}")
             return self._fallback_script(text)
     
-    def _post_process_script(self, script: str) -> str:
-        script = script.replace('。。', '。')
-        script = script.replace('、、', '、')
+    @retry(
+        wait=wait_retry_after(multiplier=1, min=2, max=30),
+        stop=stop_after_attempt(5),
+        retry=retry_if_exception(is_retryable_error),
+        reraise=True,
+    )
+    async def _call_model(self, contents: List[str]) -> str:
+        """Call Gemini, retrying rate-limit and transient server errors with exponential backoff"""
+        # ストリーミングで受信し、生成された部分から順に受け取る
+        response = await self.model.generate_content_async(contents, stream=True)
+        
+        parts = []
+        async for chunk in response:
+            if chunk.parts:
+                parts.append(chunk.text)
         
-        lines = script.split('\n')
-        processed_lines = []
+        return ''.join(parts).strip()
+    
+    def _read_text(self, path: str) -> str:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    def _write_text(self, path: str, text: str):
+        with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(text)
+    
+    def _post_process_script(self, script: str) -> str:
+        script = _DUPLICATE_PUNCT_RE.sub(r'\1', script)
         
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('*'):
-                processed_lines.append(line)
+        processed_lines = [
+            line for line in (raw.strip() for raw in script.split('\n'))
+            if line and not line.startswith(('#', '*'))
+        ]
         
         return '\n\n'.join(processed_lines)
     
@@ -97,22 +168,20 @@ class ScriptPhase:
         script_parts.append("皆さん、こんにちは。今回は次の内容についてお話しします。")
         
         for para in paragraphs:
-            para = para.strip()
-            if para:
-                sentences = para.replace('。', '。\n').split('\n')
-                for sentence in sentences:
-                    sentence = sentence.strip()
-                    if sentence:
-                        if len(sentence) > 100:
-                            mid = len(sentence) // 2
-                            split_point = sentence.find('、', mid - 20, mid + 20)
-                            if split_point > 0:
-                                script_parts.append(sentence[:split_point + 1])
-                                script_parts.append(sentence[split_point + 1:])
-                            else:
-                                script_parts.append(sentence)
-                        else:
-                            script_parts.append(sentence)
+            for sentence in _SENTENCE_RE.findall(para):
+                sentence = sentence.strip()
+                if not sentence:
+                    continue
+                
+                if len(sentence) > 100:
+                    mid = len(sentence) // 2
+                    split_point = sentence.find('、', mid - 20, mid + 20)
+                    if split_point > 0:
+                        script_parts.append(sentence[:split_point + 1])
+                        script_parts.append(sentence[split_point + 1:])
+                        continue
+                
+                script_parts.append(sentence)
         
         script_parts.append("\n以上が今回の内容でした。ありがとうございました。")
         
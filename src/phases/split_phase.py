@@ -1,21 +1,135 @@
+import bisect
+import hashlib
 import json
+import mmap
 import os
-from typing import Dict, List
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import google.generativeai as genai
+# 旧分割経路（_split_content → _apply_splits）でのみ使う任意依存。
+# この経路は現在どこからも呼ばれていないので requirements には含めない
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick が無い環境では str.find で検索する
+    ahocorasick = None
 
-from ..utils import Config, setup_logger
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson が無い環境では標準の json を使う
+    _json_loads = json.loads
+
+from ..utils import (
+    IO_WORKERS, Config, LLMCache, atomic_path, get_generative_model, setup_logger,
+    write_bytes_atomic
+)
 
 logger = setup_logger(__name__)
 
+# 応答から JSON 部分を取り出す（```json フェンス優先、無ければ最初の { から最後の } まで）
+_JSON_FENCE_RE = re.compile(r'```json(.*?)(?:```|\Z)', re.DOTALL)
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+# 日本語の読み上げ速度（約300文字/分）。チャンク長や推定再生時間の計算に使う
+_CHARS_PER_MINUTE = 300
+
+# 分割結果に問題があったとき、修正指示付きで再依頼する回数
+_SPLIT_CORRECTION_RETRIES = 1
+
+# この文字数を超える入力はプロンプトに埋め込まず File API でアップロードして参照する
+_FILE_UPLOAD_THRESHOLD = 100_000
+
+# アップロード済みファイルのハンドル（本文の sha256 → File）。リトライや別インスタンスでも再利用する
+_uploaded_files: Dict[str, Any] = {}
+
+# 分割プロンプト（{target_minutes} / {estimated_chunks} / {correction} を埋め、本文は末尾に付けるか添付する）
+SPLIT_PROMPT_TEMPLATE = """あなたは編集者兼ポッドキャスト脚本家です。
+以下の全文テキストを、論理的にまとまりのある「節」単位で切り分けてください。
+
+### 必須ルール
+1. 各チャンクは **600〜1200字** に収めること。
+2. 出力は **JSON配列**。各要素は下記キーを持つこと。  
+   - "id": 連番（1,2,3…）  
+   - "title": チャンク小見出し（15字以内）  
+   - "text": チャンク本文（規定文字数内）  
+3. 最後に `summary_quality` キーで "OK" もしくは "NEEDS REVIEW" を返すこと。  
+
+### 目標
+- チャンクは **音声化したとき約{target_minutes}分**で聴ける長さにする。
+- 途中で話題が途切れないよう、自然な分割点を選ぶ。
+- 全体を約{estimated_chunks}個のチャンクに分割することを目標とする。
+
+### 注意事項
+- 章や節の区切りを優先的に利用する
+- 段落の途中では絶対に分割しない
+- 文の途中では絶対に分割しない
+- 各チャンクが独立して理解できるようにする
+
+### 出力形式
+{{
+  "chunks": [
+    {{
+      "id": 1,
+      "title": "はじめに",
+      "text": "ここに600-1200字の本文..."
+    }},
+    {{
+      "id": 2,
+      "title": "基本概念",
+      "text": "ここに600-1200字の本文..."
+    }}
+  ],
+  "summary_quality": "OK"
+}}
+
+{correction}### テキスト全文
+"""
+
+# 旧方式（区切り位置のマーカーを返させる）の分割プロンプト
+LEGACY_SPLIT_PROMPT_TEMPLATE = """以下のテキストを読んで、すべての自然な区切りを特定してください。
+
+分割対象:
+1. 章の開始（例：「第1章」「Chapter 1」など）
+2. 大きな節の区切り（例：「1.1」「■」など）
+3. 明確な話題の転換点
+4. その他の自然な区切り
+
+出力形式:
+JSONフォーマットで、以下の形式で出力してください:
+{{
+  "splits": [
+    {{
+      "marker_text": "分割位置の直前の文（正確な文字列、30-50文字程度）",
+      "split_type": "章の開始" / "節の区切り" / "話題の転換" / "その他"
+    }}
+  ]
+}}
+
+重要な指示: 
+- すべての自然な区切りを漏れなく特定してください
+- marker_textは分割位置の「直前」の文を正確にコピーしてください
+- 省略記号（...）は絶対に使わないでください
+- 文字数は気にせず、内容的に自然な位置をすべて挙げてください
+
+テキスト全文:
+{text}"""
+
+def _chunk_field(item: Any, name: str) -> str:
+    """分割結果の要素から文字列のフィールドを取り出す（dict でない・文字列でない場合は空文字）"""
+    value = item.get(name) if isinstance(item, dict) else None
+    return value if isinstance(value, str) else ''
+
 class SplitPhase:
     def __init__(self, config: Config, output_dir: str = "output/chunks"):
         self.config = config
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
+        self.cache = LLMCache(os.path.join(output_dir, ".cache"))
         
-        genai.configure(api_key=config.genai_api_key)
-        self.model = genai.GenerativeModel(config.model_split)
+        self.model = get_generative_model(config.genai_api_key, config.model_split)
     
     def process(self, input_file: str, target_minutes: int = 5) -> List[str]:
         if not os.path.exists(input_file):
@@ -23,15 +137,21 @@ class SplitPhase:
         
         logger.info(f"Processing file for content splitting: {input_file}")
         
-        with open(input_file, 'r', encoding='utf-8') as f:
-            text = f.read()
+        output_path = os.path.join(self.output_dir, "chunk_1.txt")
+        
+        # UTF-8 の文字数はバイト数を超えないので、600バイト未満なら読まずにそのままコピーする
+        if os.path.getsize(input_file) < 600:
+            logger.info("Text is short enough, no splitting needed")
+            with atomic_path(output_path) as tmp_path:
+                shutil.copyfile(input_file, tmp_path)
+            return [output_path]
+        
+        text = self._read_text(input_file)
         
         # 約300文字/分で判定
         if len(text) < 600:  # 2分未満のテキストは分割不要
             logger.info("Text is short enough, no splitting needed")
-            output_path = os.path.join(self.output_dir, "chunk_1.txt")
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(text)
+            write_bytes_atomic(output_path, text.encode('utf-8'))
             return [output_path]
         
         # 新しい分割メソッドを使用
@@ -40,33 +160,77 @@ class SplitPhase:
         if not chunk_data:
             raise RuntimeError("Failed to split content")
         
-        chunks = [item.get('text', '') for item in chunk_data if item.get('text')]
+        # 書き込む前に全体を検証し、問題があれば修正指示を付けて再依頼する
+        problems = self._validate_chunks(chunk_data)
+        for _ in range(_SPLIT_CORRECTION_RETRIES):
+            if not problems:
+                break
+            logger.warning(f"Split result has {len(problems)} problem(s), retrying with corrections")
+            corrected = self._split_content_v2(text, target_minutes, problems)
+            corrected_problems = self._validate_chunks(corrected) if corrected else problems
+            if corrected and len(corrected_problems) < len(problems):
+                chunk_data, problems = corrected, corrected_problems
+        for problem in problems:
+            logger.warning(f"Split result problem: {problem}")
         
-        output_paths = []
-        for i, chunk in enumerate(chunks, 1):
-            output_path = os.path.join(self.output_dir, f"chunk_{i}.txt")
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(chunk)
-            output_paths.append(output_path)
-            
-            # 推定読み上げ時間を計算（日本語の場合、約300文字/分）
-            estimated_minutes = len(chunk) / 300
+        valid_items = [item for item in chunk_data if _chunk_field(item, 'text').strip()]
+        if not valid_items:
+            raise RuntimeError("Failed to split content: no chunk has text")
+        
+        # 各チャンクの書き込みは独立しているのでスレッドで並行に行う
+        items = []
+        seen_titles = set()
+        for i, item in enumerate(valid_items, 1):
+            title = _chunk_field(item, 'title').strip() or f'チャンク{i}'
+            if title in seen_titles:
+                title = f"{title}（{i}）"
+            seen_titles.add(title)
+            items.append((i, _chunk_field(item, 'text'), title))
+        
+        with ThreadPoolExecutor(max_workers=IO_WORKERS) as executor:
+            output_paths = list(executor.map(self._write_chunk, items))
+        
+        for i, chunk, _ in items:
+            # 推定読み上げ時間を計算
+            estimated_minutes = len(chunk) / _CHARS_PER_MINUTE
             logger.info(f"Created chunk {i}: {len(chunk)} characters (約{estimated_minutes:.1f}分)")
-            
-            # メタデータも保存
-            if i <= len(chunk_data):
-                meta_path = os.path.join(self.output_dir, f"chunk_{i}_meta.json")
-                with open(meta_path, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        "id": i,
-                        "title": chunk_data[i-1].get('title', f'チャンク{i}'),
-                        "char_count": len(chunk),
-                        "estimated_minutes": estimated_minutes
-                    }, f, ensure_ascii=False, indent=2)
         
         return output_paths
     
+    def _write_chunk(self, item: Tuple[int, str, str]) -> str:
+        """チャンク本文とメタデータを書き込み、本文のパスを返す"""
+        i, chunk, title = item
+        output_path = os.path.join(self.output_dir, f"chunk_{i}.txt")
+        write_bytes_atomic(output_path, chunk.encode('utf-8'))
+        
+        # メタデータも保存
+        meta_path = os.path.join(self.output_dir, f"chunk_{i}_meta.json")
+        meta = json.dumps({
+            "id": i,
+            "title": title,
+            "char_count": len(chunk),
+            "estimated_minutes": len(chunk) / _CHARS_PER_MINUTE
+        }, ensure_ascii=False, indent=2)
+        write_bytes_atomic(meta_path, meta.encode('utf-8'))
+        
+        return output_path
+    
+    def _read_text(self, input_file: str) -> str:
+        with open(input_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ''
+            # mmap のバッファから直接デコードし、中間の bytes コピーを作らない
+            # （PDF抽出由来の不正なバイト列があっても落とさず U+FFFD に置き換える）
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                text = str(mm, 'utf-8', 'replace')
+        
+        # テキストモードの open と同様に改行を \n に揃える
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text
+    
     def _split_content(self, text: str, target_size: int) -> List[str]:
+        # 旧分割方式。process は _split_content_v2 を使うため現在は呼び出し元が無い
         # 全体のchunk数を推定
         text_length = len(text)
         estimated_chunks = max(2, int(text_length / target_size))
@@ -76,33 +240,7 @@ class SplitPhase:
         logger.info(f"Target chunk size: {target_size} characters")
         logger.info(f"Estimated chunks: {estimated_chunks}")
         
-        prompt = f"""以下のテキストを読んで、すべての自然な区切りを特定してください。
-
-分割対象:
-1. 章の開始（例：「第1章」「Chapter 1」など）
-2. 大きな節の区切り（例：「1.1」「■」など）
-3. 明確な話題の転換点
-4. その他の自然な区切り
-
-出力形式:
-JSONフォーマットで、以下の形式で出力してください:
-{{
-  "splits": [
-    {{
-      "marker_text": "分割位置の直前の文（正確な文字列、30-50文字程度）",
-      "split_type": "章の開始" / "節の区切り" / "話題の転換" / "その他"
-    }}
-  ]
-}}
-
-重要な指示: 
-- すべての自然な区切りを漏れなく特定してください
-- marker_textは分割位置の「直前」の文を正確にコピーしてください
-- 省略記号（...）は絶対に使わないでください
-- 文字数は気にせず、内容的に自然な位置をすべて挙げてください
-
-テキスト全文:
-{text}"""
+        prompt = LEGACY_SPLIT_PROMPT_TEMPLATE.format(text=text)
         
         try:
             response = self.model.generate_content(prompt)
@@ -122,24 +260,26 @@ JSONフォーマットで、以下の形式で出力してください:
             return self._simple_split(text, target_size)
     
     def _parse_split_response(self, response_text: str) -> Dict:
+        # 応答全体がそのままJSONならフェンス探索をせずにパースする
+        try:
+            parsed = _json_loads(response_text.strip())
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict):
+            return parsed
+        
         try:
             # JSONブロックを抽出（```json...```形式に対応）
-            if '```json' in response_text:
-                json_start = response_text.find('```json') + 7
-                json_end = response_text.find('```', json_start)
-                if json_end > json_start:
-                    json_text = response_text[json_start:json_end].strip()
-                else:
-                    json_text = response_text[json_start:].strip()
+            match = _JSON_FENCE_RE.search(response_text)
+            if match:
+                json_text = match.group(1).strip()
             else:
-                json_start = response_text.find('{')
-                json_end = response_text.rfind('}') + 1
-                if json_start >= 0 and json_end > json_start:
-                    json_text = response_text[json_start:json_end]
-                else:
+                match = _JSON_OBJECT_RE.search(response_text)
+                if not match:
                     return {}
+                json_text = match.group(0)
             
-            parsed = json.loads(json_text)
+            parsed = _json_loads(json_text)
             logger.debug(f"Parsed JSON: {json.dumps(parsed, ensure_ascii=False)[:500]}")
             return parsed
         except Exception as e:
@@ -150,12 +290,14 @@ JSONフォーマットで、以下の形式で出力してください:
     def _apply_splits(self, text: str, splits: List[Dict]) -> List[str]:
         chunks = []
         last_pos = 0
+        find_marker = self._build_marker_finder(text, [split.get('marker_text', '') for split in splits])
         
         for i, split in enumerate(splits):
             marker = split.get('marker_text', '')
-            if marker in text[last_pos:]:
+            marker_pos = find_marker(marker, last_pos)
+            if marker_pos >= 0:
                 # marker_textの終了位置で分割（marker自体は前のチャンクに含める）
-                split_pos = text.find(marker, last_pos) + len(marker)
+                split_pos = marker_pos + len(marker)
                 chunk = text[last_pos:split_pos].strip()
                 if chunk:  # 空でないチャンクのみ追加
                     chunks.append(chunk)
@@ -174,6 +316,55 @@ JSONフォーマットで、以下の形式で出力してください:
         
         return chunks
     
+    def _build_marker_finder(self, text: str, markers: List[str]) -> Callable[[str, int], int]:
+        """Return find(marker, start) -> index of the first occurrence at or after start, or -1"""
+        if ahocorasick is None:
+            return self._memoized_finder(text)
+        
+        # Aho-Corasick で全マーカーの出現位置を1回の走査でまとめて求める
+        automaton = ahocorasick.Automaton()
+        for marker in set(markers):
+            if marker:
+                automaton.add_word(marker, marker)
+        if len(automaton) == 0:
+            return text.find
+        automaton.make_automaton()
+        
+        occurrences: Dict[str, List[int]] = {}
+        for end_idx, marker in automaton.iter(text):
+            occurrences.setdefault(marker, []).append(end_idx - len(marker) + 1)
+        
+        def find(marker: str, start: int) -> int:
+            if not marker:
+                return text.find(marker, start)
+            starts = occurrences.get(marker, [])
+            idx = bisect.bisect_left(starts, start)
+            return starts[idx] if idx < len(starts) else -1
+        
+        return find
+    
+    def _memoized_finder(self, text: str) -> Callable[[str, int], int]:
+        """str.find に、マーカーごとの前回の検索結果を再利用するキャッシュを被せる"""
+        # marker -> (前回の検索開始位置, 見つかった位置 or -1)
+        last_results: Dict[str, Tuple[int, int]] = {}
+        
+        def find(marker: str, start: int) -> int:
+            if not marker:
+                return text.find(marker, start)
+            cached = last_results.get(marker)
+            if cached is not None:
+                prev_start, prev_pos = cached
+                if start >= prev_start:
+                    # 前回より後ろから探す場合、前回の位置が範囲内ならそれが答え、
+                    # 前回見つからなかったなら今回も見つからない
+                    if prev_pos < 0 or prev_pos >= start:
+                        return prev_pos
+            pos = text.find(marker, start)
+            last_results[marker] = (start, pos)
+            return pos
+        
+        return find
+    
     def _merge_small_chunks(self, chunks: List[str], min_size: int = 1000) -> List[str]:
         """小さいチャンクを次のチャンクとマージする"""
         if not chunks:
@@ -183,35 +374,39 @@ JSONフォーマットで、以下の形式で出力してください:
         logger.info(f"Initial chunk count: {len(chunks)}")
         
         merged_chunks = []
-        current_chunk = chunks[0]
+        # 文字列を毎回連結せず、パーツを溜めてフラッシュ時に1回だけ join する
+        current_parts = [chunks[0]]
+        current_len = len(chunks[0])
         
         for next_chunk in chunks[1:]:
-            if len(current_chunk) < min_size:
+            if current_len < min_size:
                 # 現在のチャンクが小さい場合は次のチャンクとマージ
-                current_chunk = current_chunk + "\n\n" + next_chunk
-                logger.debug(f"Merged chunk: {len(current_chunk)} chars")
+                current_parts.append(next_chunk)
+                current_len += len(next_chunk) + 2
+                logger.debug(f"Merged chunk: {current_len} chars")
             else:
                 # 現在のチャンクが十分大きい場合は保存して次へ
-                merged_chunks.append(current_chunk)
-                current_chunk = next_chunk
+                merged_chunks.append("\n\n".join(current_parts))
+                current_parts = [next_chunk]
+                current_len = len(next_chunk)
         
         # 最後のチャンクを処理
-        if current_chunk:
-            if len(current_chunk) < min_size and merged_chunks:
+        if current_len:
+            if current_len < min_size and merged_chunks:
                 # 最後のチャンクが小さい場合は前のチャンクとマージ
-                merged_chunks[-1] = merged_chunks[-1] + "\n\n" + current_chunk
+                merged_chunks[-1] = "\n\n".join([merged_chunks[-1], *current_parts])
                 logger.debug(f"Merged last chunk with previous: {len(merged_chunks[-1])} chars")
             else:
-                merged_chunks.append(current_chunk)
+                merged_chunks.append("\n\n".join(current_parts))
         
         logger.info(f"Final chunk count: {len(merged_chunks)}")
         return merged_chunks
     
-    def _split_content_v2(self, text: str, target_minutes: int = 5) -> List[Dict]:
+    def _split_content_v2(self, text: str, target_minutes: int = 5,
+                          problems: Optional[List[str]] = None) -> List[Dict]:
         """新しい分割メソッド：Geminiに直接chunk分割を依頼"""
-        # 日本語の読み上げ速度を基準に文字数を計算（約300文字/分）
-        chars_per_minute = 300
-        target_chars = target_minutes * chars_per_minute
+        # 日本語の読み上げ速度を基準に文字数を計算
+        target_chars = target_minutes * _CHARS_PER_MINUTE
         
         # 全体の文字数から適切なchunk数を計算
         text_length = len(text)
@@ -222,58 +417,45 @@ JSONフォーマットで、以下の形式で出力してください:
         logger.info(f"Target chars per chunk: {target_chars}")
         logger.info(f"Estimated number of chunks: {estimated_chunks}")
         
-        prompt = f"""あなたは編集者兼ポッドキャスト脚本家です。
-以下の全文テキストを、論理的にまとまりのある「節」単位で切り分けてください。
-
-### 必須ルール
-1. 各チャンクは **600〜1200字** に収めること。
-2. 出力は **JSON配列**。各要素は下記キーを持つこと。  
-   - "id": 連番（1,2,3…）  
-   - "title": チャンク小見出し（15字以内）  
-   - "text": チャンク本文（規定文字数内）  
-3. 最後に `summary_quality` キーで "OK" もしくは "NEEDS REVIEW" を返すこと。  
-
-### 目標
-- チャンクは **音声化したとき約{target_minutes}分**で聴ける長さにする。
-- 途中で話題が途切れないよう、自然な分割点を選ぶ。
-- 全体を約{estimated_chunks}個のチャンクに分割することを目標とする。
-
-### 注意事項
-- 章や節の区切りを優先的に利用する
-- 段落の途中では絶対に分割しない
-- 文の途中では絶対に分割しない
-- 各チャンクが独立して理解できるようにする
-
-### 出力形式
-{{
-  "chunks": [
-    {{
-      "id": 1,
-      "title": "はじめに",
-      "text": "ここに600-1200字の本文..."
-    }},
-    {{
-      "id": 2,
-      "title": "基本概念",
-      "text": "ここに600-1200字の本文..."
-    }}
-  ],
-  "summary_quality": "OK"
-}}
-
-### テキスト全文
-{text}"""
+        # 前回の結果に問題があった場合は、その内容を修正指示としてプロンプトに加える
+        correction = ""
+        if problems:
+            correction = "### 前回の出力の問題点（必ず修正すること）\n" + "".join(
+                f"- {problem}\n" for problem in problems
+            ) + "\n"
+        
+        prompt = SPLIT_PROMPT_TEMPLATE.format(
+            target_minutes=target_minutes, estimated_chunks=estimated_chunks,
+            correction=correction
+        )
         
         try:
-            response = self.model.generate_content(prompt)
-            logger.debug(f"Gemini response (first 500 chars): {response.text[:500]}")
+            # 同じモデル・プロンプトの分割結果はキャッシュから返す
+            # 改行位置や空白だけが異なる入力（PDFの再抽出など）も同じキーになるよう空白を除いて比較する
+            key = LLMCache.make_key(self.config.model_split, ''.join(prompt.split()), ''.join(text.split()))
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"Using cached split result: {key}")
+                response_text = cached.decode('utf-8')
+            else:
+                if text_length > _FILE_UPLOAD_THRESHOLD:
+                    # 大きな入力は本文をアップロードし、プロンプトにはハンドルだけを渡す
+                    contents = [prompt + "（添付のテキストファイルを参照）", self._upload_text(text)]
+                else:
+                    contents = prompt + text
+                response = self.model.generate_content(contents)
+                response_text = response.text
+                logger.debug(f"Gemini response (first 500 chars): {response_text[:500]}")
             
-            result = self._parse_split_response(response.text)
+            result = self._parse_split_response(response_text)
             
             if not result or not result.get('chunks'):
                 logger.warning("Failed to get chunks from Gemini")
                 return []
             
+            if cached is None:
+                self.cache.put(key, response_text.encode('utf-8'))
+            
             chunks = result.get('chunks', [])
             quality = result.get('summary_quality', 'UNKNOWN')
             
@@ -289,6 +471,51 @@ JSONフォーマットで、以下の形式で出力してください:
             logger.error(f"Error in _split_content_v2: {e}")
             return []
     
+    def _validate_chunks(self, chunk_data: List[Dict]) -> List[str]:
+        """分割結果の問題点（空の本文・見出しの重複）を列挙する
+        
+        文字数は target_minutes の目安とプロンプトの字数ルールが食い違うことがあるので問わない
+        （長さで再依頼すると通常の実行でも毎回2回目の分割が走り、指定した長さも上書きされる）
+        """
+        problems = []
+        seen_titles = set()
+        for n, item in enumerate(chunk_data, 1):
+            if not _chunk_field(item, 'text').strip():
+                problems.append(f"チャンク{n}: 本文が空です")
+                continue
+            
+            if not isinstance(item.get('title'), (str, type(None))):
+                problems.append(f"チャンク{n}: 見出しは文字列にすること")
+                continue
+            title = _chunk_field(item, 'title').strip()
+            if title and title in seen_titles:
+                problems.append(f"チャンク{n}: 見出し「{title}」が重複しています")
+            seen_titles.add(title)
+        
+        return problems
+    
+    def _upload_text(self, text: str) -> Any:
+        """テキストを File API にアップロードし、同じ本文なら既存のハンドルを返す"""
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        uploaded = _uploaded_files.get(digest)
+        if uploaded is not None:
+            return uploaded
+        
+        # get_generative_model() で API キー設定済みの SDK を使う
+        import google.generativeai as genai
+        
+        fd, tmp_path = tempfile.mkstemp(suffix='.txt')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            uploaded = genai.upload_file(tmp_path, mime_type="text/plain")
+        finally:
+            os.remove(tmp_path)
+        
+        logger.info(f"Uploaded input text via File API: {uploaded.name}")
+        _uploaded_files[digest] = uploaded
+        return uploaded
+    
     def _simple_split(self, text: str, target_size: int) -> List[str]:
         logger.info("Using simple splitting method")
         
@@ -1,59 +1,184 @@
+import asyncio
+import json
 import os
-import wave
-import struct
-import time
 import re
-from typing import List
-import google.generativeai as genai
-from google.genai import Client, types
-from pydub import AudioSegment
-from ..utils import setup_logger, Config
+import shutil
+import struct
+import subprocess
+from typing import Iterable, List, Optional
+from tenacity import (
+    AsyncRetrying, RetryCallState, retry_if_exception, stop_after_attempt, wait_random
+)
+from ..utils import (
+    setup_logger, Config, KeyPool, LLMCache, atomic_path, get_generative_model,
+    is_retryable_error, retry_after_seconds, wait_retry_after, write_bytes_atomic
+)
 
 logger = setup_logger(__name__)
 
+# 44-byte RIFF/WAVE header for the fallback WAV writer, compiled once
+_WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+# Titles are generated from (and cached by) this many leading characters of a script
+_TITLE_HEAD_CHARS = 500
+
+# Script filenames that carry no topic (script_1, script_01, 3) and the
+# numbering prefix stripped from descriptive ones (script_01_intro -> intro)
+_GENERIC_STEM_RE = re.compile(r'^(script_?)?\d+$', re.IGNORECASE)
+_STEM_PREFIX_RE = re.compile(r'^(script_?)?\d*[_\-\s]*', re.IGNORECASE)
+# Shorter topics left after stripping the prefix (script_1a -> a) are not used as titles
+_MIN_FILENAME_TITLE_CHARS = 4
+
+# Static instructions for title generation, sent as the system instruction so
+# every request shares the same prefix and only the script head varies
+TITLE_SYSTEM_INSTRUCTION = """以下のスクリプトの内容を要約して、簡潔なタイトルを生成してください。
+
+要件:
+1. 最大20文字以内
+2. スクリプトの主要なトピックを反映
+3. ファイル名として使用可能（特殊文字を使わない）
+4. 日本語または英語
+5. タイトルのみを返す（説明文は不要）"""
+
+# Filename sanitization in one pass: characters that are unsafe in paths and
+# spaces become "_", control characters are dropped
+_FILENAME_TABLE = {
+    **{ord(c): '_' for c in '<>:"/\\|?* '},
+    **{c: None for c in [*range(0x00, 0x20), *range(0x7f, 0xa0)]},
+}
+
+# Response schema for batched title generation: {"titles": [{"id": ..., "title": ...}]}
+_TITLES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "titles": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "title": {"type": "string"},
+                },
+                "required": ["id", "title"],
+            },
+        },
+    },
+    "required": ["titles"],
+}
+
+# How long a rate-limited API key sits out when the error carries no retry delay
+_KEY_COOLDOWN_SECONDS = 60
+
+class EmptyAudioResponse(Exception):
+    """Raised when a TTS response carries no audio parts"""
+
+def _log_tts_retry(retry_state: RetryCallState):
+    logger.error(f"Attempt {retry_state.attempt_number} failed: {retry_state.outcome.exception()}")
+
 class SynthesizePhase:
     def __init__(self, config: Config, output_dir: str = "output/audio"):
         self.config = config
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
+        self.cache = LLMCache(os.path.join(output_dir, ".cache"))
         
         # Initialize new client for audio generation
-        self.client = Client(api_key=config.genai_api_key)
+        # (google.genai is imported here rather than at module level so that
+        # commands which never synthesize don't pay for loading the SDK)
+        from google.genai import Client, types
+        self._types = types
+        # One client per API key; TTS requests rotate across them via the pool
+        api_keys = config.genai_api_keys or (config.genai_api_key,)
+        self.key_pool = KeyPool(api_keys)
+        self.clients = {key: Client(api_key=key) for key in api_keys}
         self.model_name = config.model_tts
         
         # Initialize generative model for title generation
-        genai.configure(api_key=config.genai_api_key)
-        self.text_model = genai.GenerativeModel(config.model_script)
+        self.title_model = get_generative_model(
+            config.genai_api_key, config.model_script, TITLE_SYSTEM_INSTRUCTION
+        )
     
-    def process(self, script_files: List[str], voice_name: str = None, 
+    def process(self, script_files: Iterable[str], voice_name: str = None, 
                 voice_style: str = None) -> List[str]:
-        logger.info(f"Processing {len(script_files)} scripts for audio synthesis")
-        
+        """Synthesize audio for each script; script_files may be a lazily filled iterator"""
         voice_name = voice_name or self.config.voice_name
         voice_style = voice_style or self.config.voice_style
         
-        output_paths = []
+        return asyncio.run(self._process_async(script_files, voice_name, voice_style))
+    
+    async def _process_async(self, script_files: Iterable[str], voice_name: str,
+                             voice_style: str) -> List[str]:
+        # Each synthesis is an independent, network-bound TTS round-trip;
+        # the semaphore caps how many run at once
+        semaphore = asyncio.Semaphore(self.config.tts_concurrency)
         
-        for i, script_file in enumerate(script_files, 1):
-            if not os.path.exists(script_file):
-                logger.warning(f"Script file not found: {script_file}")
-                continue
-            
-            with open(script_file, 'r', encoding='utf-8') as f:
-                text = f.read()
-            
-            audio_path = self._synthesize_audio(text, i, voice_name, voice_style)
+        async def run_one(i: int, text: str, title: Optional[str] = None) -> Optional[str]:
+            async with semaphore:
+                audio_path = await self._synthesize_audio(text, i, voice_name, voice_style, title)
             if audio_path:
-                output_paths.append(audio_path)
                 logger.info(f"Generated audio {i}: {audio_path}")
+            return audio_path
         
-        return output_paths
+        tasks = []
+        i = 0
+        if isinstance(script_files, (list, tuple)):
+            # All scripts are known up front, so name them with a single title request
+            # (scripts whose filename already carries a title are left out of it)
+            texts, titles = {}, {}
+            for i, script_file in enumerate(script_files, 1):
+                text = self._read_script(script_file)
+                if text is not None:
+                    texts[i] = text
+                    titles[i] = self._title_from_filename(script_file)
+            untitled = [index for index, title in titles.items() if title is None]
+            batch_titles = await self._generate_titles_batch(
+                [texts[index][:_TITLE_HEAD_CHARS] for index in untitled]
+            )
+            titles.update(zip(untitled, batch_titles))
+            for index, text in texts.items():
+                tasks.append(asyncio.create_task(run_one(index, text, titles[index])))
+        else:
+            # Pull scripts as they become available (next() may block on a producer,
+            # so it runs off the event loop) and start synthesizing each one at once
+            it = iter(script_files)
+            while (script_file := await asyncio.to_thread(next, it, None)) is not None:
+                i += 1
+                text = self._read_script(script_file)
+                if text is not None:
+                    title = self._title_from_filename(script_file)
+                    tasks.append(asyncio.create_task(run_one(i, text, title)))
+        
+        logger.info(f"Received {i} scripts for audio synthesis")
+        results = await asyncio.gather(*tasks)
+        logger.info(f"Cache stats: {self.cache.stats}")
+        return [path for path in results if path]
+    
+    def _read_script(self, script_file: str) -> Optional[str]:
+        if not os.path.exists(script_file):
+            logger.warning(f"Script file not found: {script_file}")
+            return None
+        with open(script_file, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    def _title_from_filename(self, script_file: str) -> Optional[str]:
+        """Use a descriptive filename (e.g. script_01_intro.txt -> "intro") as the title
+        
+        Generic names such as script_1.txt return None so the title is generated instead.
+        """
+        stem = os.path.splitext(os.path.basename(script_file))[0]
+        title = self._clean_title(_STEM_PREFIX_RE.sub('', stem))
+        # Check what is left of the name, not the raw stem, so that the numbering
+        # prefix cannot make a one-letter topic look long enough
+        if len(title) < _MIN_FILENAME_TITLE_CHARS or _GENERIC_STEM_RE.match(title):
+            return None
+        return title
     
-    def _synthesize_audio(self, text: str, index: int, voice_name: str, 
-                         voice_style: str) -> str:
+    async def _synthesize_audio(self, text: str, index: int, voice_name: str, 
+                                voice_style: str, title: Optional[str] = None) -> str:
         try:
-            # Generate title from script content
-            title = self._generate_title(text)
+            # Generate title from script content unless it was generated in a batch
+            if title is None:
+                title = await self._generate_title(text[:_TITLE_HEAD_CHARS])
             sanitized_title = self._sanitize_filename(title)
             logger.info(f"Generated title: {title} -> {sanitized_title}")
             
@@ -65,140 +190,283 @@ class SynthesizePhase:
             else:
                 content = text
             
-            # Retry mechanism for API calls
-            max_attempts = 3
-            for attempt in range(max_attempts):
-                try:
-                    logger.debug(f"Attempt {attempt + 1} of {max_attempts} for TTS generation")
-                    
-                    # Call Gemini API with TTS configuration using new client
-                    response = self.client.models.generate_content(
-                        model=self.model_name,
-                        contents=content,
-                        config=types.GenerateContentConfig(
-                            response_modalities=["AUDIO"],
-                            speech_config=types.SpeechConfig(
-                                voice_config=types.VoiceConfig(
-                                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                        voice_name=voice_name
-                                    )
-                                )
-                            ),
-                        )
-                    )
-                    
-                    # Extract audio data from response
-                    if response.candidates and response.candidates[0].content.parts:
-                        audio_data = response.candidates[0].content.parts[0].inline_data.data
-                        
-                        # Save as WAV first
-                        wav_path = os.path.join(self.output_dir, f"{index}_{sanitized_title}.wav")
-                        self._save_audio_as_wav(audio_data, wav_path)
-                        
-                        # Convert to MP3
-                        mp3_path = os.path.join(self.output_dir, f"{index}_{sanitized_title}.mp3")
-                        self._convert_to_mp3(wav_path, mp3_path, title)
-                        
-                        # Remove temporary WAV file
-                        if os.path.exists(mp3_path):
-                            os.remove(wav_path)
-                        
-                        logger.info(f"Successfully generated audio file: {mp3_path}")
-                        return mp3_path
-                    else:
-                        logger.error("No audio data in API response")
-                        
-                except Exception as e:
-                    logger.error(f"Attempt {attempt + 1} failed: {e}")
-                    if attempt < max_attempts - 1:
-                        time.sleep(1)  # Wait before retry
-                    else:
-                        raise e
+            mp3_path = os.path.join(self.output_dir, f"{index}_{sanitized_title}.mp3")
+            
+            # Reuse the MP3 encoded earlier for the same model, voice, content and title
+            # (the title is part of the key because it is embedded in the ID3 tags)
+            key = LLMCache.make_key(self.model_name, voice_name, voice_style or "", content, title)
+            mp3_data = self.cache.get(key)
+            if mp3_data is not None:
+                logger.info(f"Using cached audio: {key}")
+                await asyncio.to_thread(write_bytes_atomic, mp3_path, mp3_data)
+                return mp3_path
+            
+            audio_data = await self._generate_speech(content, voice_name)
+            
+            # Encode the PCM data straight to MP3 (ffmpeg runs off the event loop)
+            if await asyncio.to_thread(self._encode_mp3, audio_data, mp3_path, title):
+                await asyncio.to_thread(self._cache_file, key, mp3_path)
+            
+            logger.info(f"Successfully generated audio file: {mp3_path}")
+            return mp3_path
             
         except Exception as e:
             logger.error(f"Error generating audio with Gemini API: {e}")
             logger.info("Falling back to placeholder audio")
             
-            # Fallback to placeholder audio
             mp3_path = os.path.join(self.output_dir, f"{index}_{sanitized_title}.mp3")
+            await asyncio.to_thread(
+                self._save_placeholder_audio, mp3_path, title, voice_name, voice_style
+            )
+            return mp3_path
+    
+    async def _generate_speech(self, content: str, voice_name: str) -> bytes:
+        """Call Gemini TTS with retries and return the raw PCM audio data"""
+        retrying = AsyncRetrying(
+            wait=wait_retry_after(multiplier=1, min=1, max=30) + wait_random(0, 1),
+            stop=stop_after_attempt(self.config.tts_max_attempts),
+            retry=retry_if_exception(is_retryable_error),
+            before_sleep=_log_tts_retry,
+            reraise=True,
+        )
+        return await retrying(self._hedged_request_speech, content, voice_name)
+    
+    async def _hedged_request_speech(self, content: str, voice_name: str) -> bytes:
+        """Send a backup TTS request if the first is still running after the hedge delay
+        
+        Whichever request succeeds first wins and the other is cancelled. Hedging is
+        off unless TTS_HEDGE_DELAY is set, since every hedge can double the TTS spend.
+        """
+        delay = self.config.tts_hedge_delay
+        if delay <= 0:
+            return await self._request_speech(content, voice_name)
+        
+        tasks = [asyncio.create_task(self._request_speech(content, voice_name))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                logger.debug(f"TTS request still running after {delay}s, sending a hedged request")
+                tasks.append(asyncio.create_task(self._request_speech(content, voice_name)))
+            
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    if error is not None:
+                        logger.warning(f"Hedged TTS request failed: {error}")
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Wait for the cancelled request so its exception is retrieved and its
+            # API key reservation is released before we return
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _request_speech(self, content: str, voice_name: str) -> bytes:
+        """Make a Gemini TTS request, moving on to another API key if one is rate limited"""
+        for attempt in range(len(self.key_pool)):
+            key = self.key_pool.reserve_key()
+            try:
+                return await self._call_tts(self.clients[key], content, voice_name)
+            except Exception as e:
+                if getattr(e, 'code', None) != 429:
+                    raise
+                self.key_pool.mark_exhausted(key, retry_after_seconds(e) or _KEY_COOLDOWN_SECONDS)
+                # Out of keys: let the retry policy back off before the next attempt
+                if attempt == len(self.key_pool) - 1 or not self.key_pool.has_available():
+                    raise
+                logger.warning("TTS API key was rate limited, switching to another key")
+            finally:
+                self.key_pool.release_key(key)
+    
+    async def _call_tts(self, client, content: str, voice_name: str) -> bytes:
+        """Make a single Gemini TTS request with the given client"""
+        # Call Gemini API with TTS configuration using the async client
+        types = self._types
+        response = await client.aio.models.generate_content(
+            model=self.model_name,
+            contents=content,
+            config=types.GenerateContentConfig(
+                response_modalities=["AUDIO"],
+                speech_config=types.SpeechConfig(
+                    voice_config=types.VoiceConfig(
+                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                            voice_name=voice_name
+                        )
+                    )
+                ),
+            )
+        )
+        
+        # Extract audio data from response
+        if response.candidates and response.candidates[0].content.parts:
+            return response.candidates[0].content.parts[0].inline_data.data
+        
+        # Treated as a failure so that it is retried like any other error
+        raise EmptyAudioResponse("No audio data in API response")
+    
+    def _save_placeholder_audio(self, mp3_path: str, title: str, voice_name: str, 
+                                voice_style: str):
+        # Copy a pre-encoded second of silence and only rewrite its tags, so a
+        # burst of failures doesn't run ffmpeg once per placeholder
+        shutil.copyfile(self._silent_template(), mp3_path)
+        
+        from mutagen.id3 import COMM, ID3, TALB, TIT2, TPE1
+        
+        tags = ID3()
+        tags.add(TIT2(encoding=3, text=title))
+        tags.add(TPE1(encoding=3, text='PDF to Podcast Generator'))
+        tags.add(TALB(encoding=3, text='Generated Content'))
+        tags.add(COMM(encoding=3, lang='eng', desc='',
+                      text=f'Voice: {voice_name}, Style: {voice_style[:50] if voice_style else "default"}...'))
+        tags.save(mp3_path)
+    
+    def _silent_template(self) -> str:
+        """Return the path of the cached 1-second silent MP3, encoding it on first use"""
+        path = os.path.join(self.cache.cache_dir, "silent_1s.mp3")
+        if not os.path.exists(path):
+            # pydub is only needed to build the template, so import it lazily
+            from pydub import AudioSegment
+            
             silent_audio = AudioSegment.silent(duration=1000)
             silent_audio = silent_audio.set_channels(1)
             silent_audio = silent_audio.set_frame_rate(44100)
-            silent_audio.export(mp3_path, format="mp3", bitrate="128k", 
-                              tags={
-                                  'title': title,
-                                  'artist': 'PDF to Podcast Generator',
-                                  'album': 'Generated Content',
-                                  'comment': f'Voice: {voice_name}, Style: {voice_style[:50] if voice_style else "default"}...'
-                              })
-            
-            return mp3_path
+            with atomic_path(path) as tmp_path:
+                silent_audio.export(tmp_path, format="mp3", bitrate="128k")
+        return path
     
     def _save_audio_as_wav(self, audio_data: bytes, output_path: str):
-        # Gemini returns 24kHz 16-bit PCM mono audio
-        with wave.open(output_path, 'wb') as wf:
-            wf.setnchannels(1)  # Mono
-            wf.setsampwidth(2)  # 16-bit
-            wf.setframerate(24000)  # 24kHz
-            wf.writeframes(audio_data)
-    
-    def _convert_to_mp3(self, wav_path: str, mp3_path: str, title: str = "Podcast Audio"):
+        # Gemini returns 24kHz 16-bit PCM mono audio; the format is fixed, so
+        # build the 44-byte RIFF header directly and write it in one go
+        header = _WAV_HEADER.pack(
+            b'RIFF', 36 + len(audio_data), b'WAVE',
+            b'fmt ', 16, 1, 1, 24000, 48000, 2, 16,  # PCM, mono, 24kHz, 16-bit
+            b'data', len(audio_data),
+        )
+        with open(output_path, 'wb') as f:
+            f.write(header + audio_data)
+    
+    def _encode_mp3(self, audio_data: bytes, mp3_path: str, title: str = "Podcast Audio") -> bool:
+        """Encode PCM to MP3; returns False if it had to fall back to a WAV file"""
+        # Pipe the raw PCM (24kHz 16-bit mono) into ffmpeg; no intermediate WAV file
+        command = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "s16le", "-ar", "24000", "-ac", "1", "-i", "pipe:0",
+            "-b:a", "128k",
+            "-metadata", f"title={title}",
+            "-metadata", "artist=PDF to Podcast Generator",
+            "-metadata", "album=Generated Content",
+            "-metadata", "genre=Podcast",
+            "-f", "mp3", mp3_path,
+        ]
         try:
-            audio = AudioSegment.from_wav(wav_path)
-            audio.export(mp3_path, format="mp3", bitrate="128k",
-                        tags={
-                            'title': title,
-                            'artist': 'PDF to Podcast Generator',
-                            'album': 'Generated Content',
-                            'genre': 'Podcast'
-                        })
-            logger.debug(f"Converted to MP3: {mp3_path}")
-        except Exception as e:
-            logger.error(f"Error converting to MP3: {e}")
-            # If conversion fails, keep the WAV file
-            os.rename(wav_path, mp3_path.replace('.mp3', '.wav'))
+            result = subprocess.run(command, input=audio_data, capture_output=True)
+        except OSError as e:  # e.g. ffmpeg is not installed
+            error = str(e)
+        else:
+            if result.returncode == 0:
+                logger.debug(f"Encoded MP3: {mp3_path}")
+                return True
+            error = result.stderr.decode('utf-8', errors='replace').strip()
+        
+        logger.error(f"Error converting to MP3: {error}")
+        # If conversion fails, keep the audio as a WAV file
+        self._save_audio_as_wav(audio_data, mp3_path.replace('.mp3', '.wav'))
+        return False
+    
+    def _cache_file(self, key: str, path: str):
+        with open(path, 'rb') as f:
+            self.cache.put(key, f.read())
+    
+    async def _title_request(self, contents: str, **kwargs):
+        """Call the title model without tying it to this event loop
+        
+        google.generativeai shares one grpc.aio client that stays bound to the first
+        event loop using it. In `all` that is ScriptPhase's loop, so
+        generate_content_async from here would fail; the sync call in a thread does not.
+        """
+        return await asyncio.to_thread(self.title_model.generate_content, contents, **kwargs)
     
-    def _generate_title(self, text: str) -> str:
-        """Generate a concise title from the script content"""
+    async def _generate_title(self, head: str) -> str:
+        """Generate a concise title from the head of the script"""
+        # Titles only depend on the model and the head of the script
+        key = LLMCache.make_key("title", self.config.model_script, head)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached.decode('utf-8')
+        
         try:
-            prompt = f"""以下のスクリプトの内容を要約して、簡潔なタイトルを生成してください。
-
-要件:
-1. 最大20文字以内
-2. スクリプトの主要なトピックを反映
-3. ファイル名として使用可能（特殊文字を使わない）
-4. 日本語または英語
-5. タイトルのみを返す（説明文は不要）
-
-スクリプト（最初の500文字）:
-{text[:500]}
-
-タイトル:"""
-            
-            response = self.text_model.generate_content(prompt)
-            title = response.text.strip()
-            
-            # Remove quotes if present
-            title = title.strip('"').strip("'").strip('「').strip('」')
-            
-            # Limit length
-            if len(title) > 20:
-                title = title[:20]
+            # Only the script head is sent per call; the fixed instructions live
+            # in the title model's system instruction
+            response = await self._title_request(
+                f"スクリプト（最初の{_TITLE_HEAD_CHARS}文字）:\n{head}\n\nタイトル:"
+            )
+            title = self._clean_title(response.text)
             
+            self.cache.put(key, title.encode('utf-8'))
             return title
         
         except Exception as e:
             logger.error(f"Error generating title: {e}")
             return "untitled"
     
+    async def _generate_titles_batch(self, heads: List[str]) -> List[Optional[str]]:
+        """Generate titles for several script heads with one JSON-mode request
+        
+        Entries left as None (on error or a missing id) fall back to _generate_title.
+        """
+        keys = [LLMCache.make_key("title", self.config.model_script, head) for head in heads]
+        titles: List[Optional[str]] = []
+        for key in keys:
+            cached = self.cache.get(key)
+            titles.append(cached.decode('utf-8') if cached is not None else None)
+        
+        pending = [idx for idx, title in enumerate(titles) if title is None]
+        pending_ids = set(pending)
+        if len(pending) < 2:
+            return titles
+        
+        snippets = [{"id": idx, "snippet": heads[idx]} for idx in pending]
+        try:
+            response = await self._title_request(
+                "次の各スクリプトについて、それぞれタイトルを生成してください。"
+                "id ごとに1つずつ返してください。\n"
+                + json.dumps(snippets, ensure_ascii=False),
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": _TITLES_SCHEMA,
+                },
+            )
+            for item in json.loads(response.text).get("titles", []):
+                idx = item.get("id")
+                if idx in pending_ids and item.get("title"):
+                    titles[idx] = self._clean_title(item["title"])
+                    self.cache.put(keys[idx], titles[idx].encode('utf-8'))
+        except Exception as e:
+            logger.error(f"Error generating titles in batch: {e}")
+        
+        return titles
+    
+    def _clean_title(self, title: str) -> str:
+        title = title.strip()
+        
+        # Remove quotes if present
+        title = title.strip('"').strip("'").strip('「').strip('」')
+        
+        # Limit length
+        if len(title) > 20:
+            title = title[:20]
+        
+        return title
+    
     def _sanitize_filename(self, filename: str) -> str:
         """Sanitize filename to be safe for filesystem"""
-        # Replace problematic characters
-        filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
-        # Replace spaces with underscores
-        filename = filename.replace(' ', '_')
-        # Remove control characters
-        filename = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', filename)
+        # Replace problematic characters and spaces, remove control characters
+        filename = filename.translate(_FILENAME_TABLE)
         # Limit length
         if len(filename) > 50:
             filename = filename[:50]
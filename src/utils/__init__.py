@@ -1,4 +1,9 @@
 from .logger import setup_logger
 from .config import Config
+from .files import IO_WORKERS, WRITE_BUFFER_SIZE, atomic_path, write_bytes_atomic
+from .llm_cache import LLMCache
+from .key_pool import KeyPool
+from .models import get_generative_model
+from .retry import is_retryable_error, retry_after_seconds, wait_retry_after
 
-__all__ = ['setup_logger', 'Config']
\ No newline at end of file
+__all__ = ['setup_logger', 'Config', 'IO_WORKERS', 'WRITE_BUFFER_SIZE', 'atomic_path', 'write_bytes_atomic', 'LLMCache', 'KeyPool', 'get_generative_model', 'is_retryable_error', 'retry_after_seconds', 'wait_retry_after']
\ No newline at end of file
@@ -1,9 +1,21 @@
+import functools
+import json
 import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Optional, Tuple, TypeVar
 from dotenv import load_dotenv
 
-@dataclass
+T = TypeVar('T')
+
+def _env_value(name: str, default: str, parse: Callable[[str], T]) -> T:
+    raw = os.getenv(name, default)
+    try:
+        return parse(raw)
+    except ValueError:
+        kind = 'an integer' if parse is int else 'a number'
+        raise ValueError(f"{name} must be {kind}, got {raw!r}") from None
+
+@dataclass(frozen=True, slots=True)
 class Config:
     genai_api_key: str
     model_split: str
@@ -11,23 +23,60 @@ class Config:
     model_tts: str
     voice_name: str
     voice_style: str
+    script_concurrency: int = 8
+    tts_concurrency: int = 4
+    tts_max_attempts: int = 5
+    # 0 なら無効。TTS がこの秒数を超えたら予備のリクエストを並行して送る
+    tts_hedge_delay: float = 0.0
+    # TTS はこの全キーでローテーションする（未指定なら genai_api_key のみ）
+    genai_api_keys: Tuple[str, ...] = ()
     
     @classmethod
+    # .env の読み込み・解析は env_file ごとに1回だけ行い、同じ（不変の）Config を返す
+    @functools.lru_cache(maxsize=None)
     def from_env(cls, env_file: Optional[str] = None) -> 'Config':
         if env_file:
             load_dotenv(env_file)
         else:
             load_dotenv()
         
-        return cls(
-            genai_api_key=os.getenv('GENAI_API_KEY', ''),
+        # GENAI_API_KEYS は JSON 配列（例: ["key1", "key2"]）。無ければ単一の GENAI_API_KEY を使う
+        api_key = os.getenv('GENAI_API_KEY', '')
+        try:
+            api_keys = json.loads(os.getenv('GENAI_API_KEYS') or '[]')
+        except json.JSONDecodeError:
+            api_keys = None
+        if not isinstance(api_keys, list):
+            raise ValueError('GENAI_API_KEYS must be a JSON array of keys, e.g. ["key1", "key2"]')
+        api_keys = tuple(key for key in api_keys if key)
+        if not api_keys and api_key:
+            api_keys = (api_key,)
+        
+        config = cls(
+            genai_api_key=api_key or (api_keys[0] if api_keys else ''),
             model_split=os.getenv('MODEL_SPLIT', 'gemini-2.0-flash-exp'),
             model_script=os.getenv('MODEL_SCRIPT', 'gemini-2.0-flash-exp'),
             model_tts=os.getenv('MODEL_TTS', 'gemini-2.0-flash-exp'),
             voice_name=os.getenv('VOICE_NAME', 'Aoede'),
-            voice_style=os.getenv('VOICE_STYLE', 'calm')
+            voice_style=os.getenv('VOICE_STYLE', 'calm'),
+            script_concurrency=_env_value('SCRIPT_CONCURRENCY', '8', int),
+            tts_concurrency=_env_value('TTS_CONCURRENCY', '4', int),
+            tts_max_attempts=_env_value('TTS_MAX_ATTEMPTS', '5', int),
+            tts_hedge_delay=_env_value('TTS_HEDGE_DELAY', '0', float),
+            genai_api_keys=api_keys
         )
+        # 設定ミスは TTS などの高コストな処理に入る前に検出する
+        config.validate()
+        return config
     
     def validate(self) -> None:
         if not self.genai_api_key:
-            raise ValueError("GENAI_API_KEY is required")
\ No newline at end of file
+            raise ValueError("GENAI_API_KEY is required")
+        # 0 以下だとセマフォやリトライが永久に待つので、ここで弾く
+        for name, value in (("SCRIPT_CONCURRENCY", self.script_concurrency),
+                            ("TTS_CONCURRENCY", self.tts_concurrency),
+                            ("TTS_MAX_ATTEMPTS", self.tts_max_attempts)):
+            if value < 1:
+                raise ValueError(f"{name} must be at least 1, got {value}")
+        if self.tts_hedge_delay < 0:
+            raise ValueError(f"TTS_HEDGE_DELAY must be 0 or greater, got {self.tts_hedge_delay}")
\ No newline at end of file
@@ -0,0 +1,29 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+# 大きなテキストを書き出すときのバッファサイズ（書き込みシステムコールの回数を減らす）
+WRITE_BUFFER_SIZE = 1 << 20
+
+# チャンク・台本の読み書きに使うスレッド数（ファイルI/O待ちを重ねるため）
+IO_WORKERS = 8
+
+@contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """Yield a temporary path to write to; it replaces path only if the block succeeds"""
+    # プロセス・スレッドごとに別名にして、並行実行時に一時ファイルを取り合わないようにする
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_bytes_atomic(path: str, data: bytes):
+    """Write data to path without ever leaving a partially written file behind"""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Sequence
+
+class KeyPool:
+    """Rotate over several API keys, skipping keys that are cooling down after a rate limit"""
+    
+    def __init__(self, keys: Sequence[str]):
+        if not keys:
+            raise ValueError("KeyPool requires at least one API key")
+        
+        self._lock = threading.Lock()
+        # 先頭ほど長く使われていないキー（reserve で末尾へ回す）
+        self._order: "OrderedDict[str, None]" = OrderedDict((key, None) for key in keys)
+        self._cooldown_until: Dict[str, float] = {key: 0.0 for key in self._order}
+        self._in_use: Dict[str, int] = {key: 0 for key in self._order}
+    
+    def __len__(self) -> int:
+        return len(self._order)
+    
+    def reserve_key(self) -> str:
+        """Return the least recently used key that is not cooling down
+        
+        If every key is cooling down, the one that becomes available first is returned.
+        """
+        with self._lock:
+            now = time.monotonic()
+            available = [key for key in self._order if self._cooldown_until[key] <= now]
+            if available:
+                # 使用中の数が少ないキーを優先し、同数なら最も長く使われていないもの
+                key = min(available, key=lambda k: self._in_use[k])
+            else:
+                key = min(self._order, key=lambda k: self._cooldown_until[k])
+            
+            self._order.move_to_end(key)
+            self._in_use[key] += 1
+            return key
+    
+    def release_key(self, key: str):
+        with self._lock:
+            if self._in_use.get(key, 0) > 0:
+                self._in_use[key] -= 1
+    
+    def mark_exhausted(self, key: str, cooldown_s: float):
+        """Keep key out of rotation for cooldown_s seconds (e.g. after a 429)"""
+        with self._lock:
+            until = time.monotonic() + cooldown_s
+            self._cooldown_until[key] = max(self._cooldown_until[key], until)
+    
+    def has_available(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            return any(until <= now for until in self._cooldown_until.values())
@@ -0,0 +1,37 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+from .files import write_bytes_atomic
+
+class LLMCache:
+    """On-disk cache for deterministic LLM/TTS responses, keyed by SHA-256 of the request"""
+    
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        # ヒット率の確認用（get のたびに hits / misses を数える）
+        self.stats = {"hits": 0, "misses": 0}
+    
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        # JSON配列にしてから hash することで、区切り位置の異なる入力が衝突しないようにする
+        payload = json.dumps(parts, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    def put(self, key: str, data: bytes):
+        # 一時ファイルに書いてから置き換え、並行実行時に書きかけのエントリを読まないようにする
+        write_bytes_atomic(self._path(key), data)
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.bin")
@@ -1,30 +1,61 @@
+import atexit
 import logging
 import os
+import queue
+import threading
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict
+
+# log_dir ごとに1つの QueueHandler を全ロガーで共有する（出力は QueueListener のスレッドが行う）
+_queue_handlers: Dict[str, QueueHandler] = {}
+_queue_handlers_lock = threading.Lock()
+
+def _get_queue_handler(log_dir: str) -> QueueHandler:
+    with _queue_handlers_lock:
+        handler = _queue_handlers.get(log_dir)
+        if handler is not None:
+            return handler
+        
+        os.makedirs(log_dir, exist_ok=True)
+        
+        # Console handler
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_format = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+        console_handler.setFormatter(console_format)
+        
+        # File handler with rotation
+        log_file = os.path.join(log_dir, f"pdf_to_podcast_{datetime.now().strftime('%Y%m%d')}.log")
+        file_handler = RotatingFileHandler(
+            log_file, maxBytes=10*1024*1024, backupCount=5
+        )
+        file_handler.setLevel(logging.DEBUG)
+        file_format = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s - %(message)s')
+        file_handler.setFormatter(file_format)
+        
+        # ログ呼び出し側はキューに積むだけにし、標準エラー・ファイルへの書き込みは
+        # バックグラウンドスレッドに任せる。終了時に stop() で残りを書き出す
+        log_queue: queue.Queue = queue.Queue(-1)
+        listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        
+        handler = QueueHandler(log_queue)
+        handler.listener = listener
+        _queue_handlers[log_dir] = handler
+        return handler
 
 def setup_logger(name: str = "pdf_to_podcast", log_dir: str = "logs") -> logging.Logger:
-    os.makedirs(log_dir, exist_ok=True)
-    
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-    
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_format = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
-    console_handler.setFormatter(console_format)
+    # 同じ名前で再度呼ばれても（再 import など）ハンドラを重複して追加しない
+    if logger.handlers:
+        return logger
     
-    # File handler with rotation
-    log_file = os.path.join(log_dir, f"pdf_to_podcast_{datetime.now().strftime('%Y%m%d')}.log")
-    file_handler = RotatingFileHandler(
-        log_file, maxBytes=10*1024*1024, backupCount=5
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_format = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s - %(message)s')
-    file_handler.setFormatter(file_format)
+    logger.setLevel(logging.DEBUG)
+    # 出力は自前のハンドラだけで行い、root ロガー側で二重に出さない
+    logger.propagate = False
     
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    logger.addHandler(_get_queue_handler(log_dir))
     
-    return logger
\ No newline at end of file
+    return logger
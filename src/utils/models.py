@@ -0,0 +1,15 @@
+import functools
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+@functools.lru_cache(maxsize=4)
+def get_generative_model(api_key: str, model_name: str,
+                         system_instruction: Optional[str] = None) -> "genai.GenerativeModel":
+    """Configure the API key and build a GenerativeModel once per (api_key, model_name, system_instruction)"""
+    # Imported lazily: the SDK is heavy and commands like `input` never reach it
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
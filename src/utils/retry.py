@@ -0,0 +1,69 @@
+import re
+from typing import Optional
+
+from tenacity import RetryCallState, wait_exponential
+
+_DURATION_RE = re.compile(r'^\s*([\d.]+)s\s*$')
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Return the server-suggested retry delay (RetryInfo / Retry-After) carried by an API error"""
+    retry_after = getattr(error, 'retry_after', None)
+    if isinstance(retry_after, (int, float)):
+        return float(retry_after)
+    
+    # HTTP Retry-After header (google.genai errors keep the httpx response)
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    header = headers.get('retry-after') if headers is not None else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    
+    details = getattr(error, 'details', None)
+    if isinstance(details, dict):
+        # google.genai: details is the JSON body {"error": {..., "details": [...]}}
+        body = details.get('error', details)
+        details = body.get('details') if isinstance(body, dict) else None
+    if not isinstance(details, (list, tuple)):
+        return None
+    
+    for detail in details:
+        # gRPC: google.rpc.RetryInfo (retry_delay は Duration)
+        retry_delay = getattr(detail, 'retry_delay', None)
+        if retry_delay is not None:
+            return retry_delay.seconds + retry_delay.nanos / 1e9
+        
+        # REST: {"@type": ".../google.rpc.RetryInfo", "retryDelay": "12s"}
+        if isinstance(detail, dict) and 'retryDelay' in detail:
+            match = _DURATION_RE.match(str(detail['retryDelay']))
+            if match:
+                return float(match.group(1))
+    
+    return None
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Whether a failed Gemini call is worth retrying
+    
+    Client errors other than timeouts and rate limits (e.g. 400 invalid argument,
+    403 permission denied) fail the same way on every attempt. Everything else,
+    including 5xx responses and errors without a status code such as connection
+    resets, is treated as transient.
+    """
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and 400 <= code < 500:
+        return code in (408, 429)
+    return True
+
+class wait_retry_after(wait_exponential):
+    """Exponential backoff that never waits less than the delay requested by the server"""
+    
+    def __call__(self, retry_state: RetryCallState) -> float:
+        backoff = super().__call__(retry_state)
+        
+        error = retry_state.outcome.exception() if retry_state.outcome else None
+        retry_after = retry_after_seconds(error) if error else None
+        if retry_after is not None:
+            return max(backoff, retry_after)
+        
+        return backoff